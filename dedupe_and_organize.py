@@ -7,19 +7,37 @@ SAFE BY DEFAULT: Dry-run unless --apply is given.
 """
 import argparse
 import csv
+import errno
 import hashlib
 import json
+import mmap
 import os
 import shutil
+import sqlite3
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
+from functools import lru_cache, partial
+from multiprocessing.pool import Pool, ThreadPool
 from pathlib import Path
 from time import localtime, strftime
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterator, List, Tuple, Optional, Union
 
-CHUNK_SIZE = 1024 * 1024
-CACHE_VERSION = 1
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+# anything below the mmap threshold fits in one read, so every file is hashed with a single update()
+CHUNK_SIZE = MMAP_MIN_SIZE
+FP_SIZE = 64 * 1024
+CACHE_VERSION = 3
+HASH_ALGOS = ("sha256", "blake3", "xxh3")
+PROCESS_POOL_MIN_BYTES = 1024 * 1024 * 1024
+HASH_CHUNKSIZE = 64
+SQLITE_SUFFIXES = (".sqlite", ".sqlite3", ".db")
+DEFAULT_CACHE_FILE = ".dedupe_cache.sqlite"
+LEGACY_CACHE_FILE = ".dedupe_cache.json"
+SQLITE_BATCH = 500
+REPORT_BUFFER = 1 << 20
 
 try:
     from tqdm import tqdm
@@ -31,6 +49,31 @@ try:
 except ImportError:
     send2trash = None
 
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# used for new caches; an existing cache keeps the algorithm it was built with
+DEFAULT_HASH = "blake3" if blake3 else "sha256"
+# fingerprints carry this prefix so cached ones from a different backend are never compared
+FP_ALGO = "xxh3" if xxhash else "blake2b"
+
 class Palette:
     def __init__(self, enable: bool):
         if enable:
@@ -49,112 +92,513 @@ def want_color(no_color_flag: bool) -> bool:
         return False
     return sys.stdout.isatty()
 
-@dataclass
+# slots drop the per-instance __dict__; dataclass(slots=True) needs 3.10+
+@dataclass(**({"slots": True} if sys.version_info >= (3, 10) else {}))
 class FileInfo:
-    path: Path
+    path: str
     size: int
     mtime: float
-    sha256: Optional[str] = None
+    dev: int = 0
+    ino: int = 0
+    digest: Optional[str] = None
+    fingerprint: Optional[str] = None
 
-def iter_files(roots: List[Path], min_size: int = 1, follow_symlinks: bool = False) -> List[FileInfo]:
+def _scan_dir(dirpath: str, min_size: int, follow_symlinks: bool) -> Tuple[List[FileInfo], List[str]]:
     files: List[FileInfo] = []
-    for root in roots:
-        root = root.expanduser().resolve()
-        if not root.exists():
-            continue
-        for dirpath, _, filenames in os.walk(root, followlinks=follow_symlinks):
-            for name in filenames:
-                p = Path(dirpath) / name
+    subdirs: List[str] = []
+    try:
+        it = os.scandir(dirpath)
+    except OSError:
+        return files, subdirs
+    try:
+        with it:
+            for entry in it:
                 try:
-                    st = p.stat()
-                except Exception:
+                    if entry.is_dir(follow_symlinks=follow_symlinks):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=follow_symlinks):
+                        st = entry.stat(follow_symlinks=follow_symlinks)
+                        if st.st_size >= min_size:
+                            files.append(FileInfo(path=entry.path, size=st.st_size, mtime=st.st_mtime,
+                                                  dev=st.st_dev, ino=st.st_ino))
+                except OSError:
                     continue
-                if p.is_file() and st.st_size >= min_size:
-                    files.append(FileInfo(path=p, size=st.st_size, mtime=st.st_mtime))
-    return files
+    except OSError:
+        # readdir failed partway (EIO/ESTALE on network mounts): keep what was listed, like os.walk
+        pass
+    return files, subdirs
+
+def iter_files(roots: List[Path], min_size: int = 1, follow_symlinks: bool = False, workers: int = 0) -> List[FileInfo]:
+    if workers <= 0:
+        workers = os.cpu_count() or 2
+    files: List[FileInfo] = []
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = set()
+        for root in roots:
+            root = root.expanduser().resolve()
+            if root.exists():
+                pending.add(ex.submit(_scan_dir, str(root), min_size, follow_symlinks))
+        # each finished directory may submit more; we're done when nothing is in flight
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                found, subdirs = fut.result()
+                files.extend(found)
+                for d in subdirs:
+                    pending.add(ex.submit(_scan_dir, d, min_size, follow_symlinks))
+    files.sort(key=lambda fi: fi.path)
+    # overlapping roots (e.g. ~/Photos and ~/Photos/2020) reach the same file twice
+    return [fi for i, fi in enumerate(files) if i == 0 or fi.path != files[i - 1].path]
 
-def hash_file(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
-        while chunk := f.read(CHUNK_SIZE):
-            h.update(chunk)
-    return h.hexdigest()
+def _new_sha256():
+    # usedforsecurity=False lets OpenSSL pick its fastest backend (SHA-NI / ARMv8 crypto)
+    if "sha256" in hashlib.algorithms_guaranteed:
+        try:
+            return hashlib.new("sha256", usedforsecurity=False)
+        except TypeError:
+            pass
+    return hashlib.sha256()
 
-def _hash_fileinfo(fi: FileInfo) -> Tuple[Path, Optional[str], Optional[str]]:
+def _new_hasher(algo: str):
+    if algo == "sha256":
+        return _new_sha256()
+    if algo == "blake3":
+        if blake3 is None:
+            raise RuntimeError("blake3 not installed; pip install blake3")
+        # AUTO lets BLAKE3 split large buffers (the mmap path) across threads
+        return blake3.blake3(max_threads=blake3.blake3.AUTO)
+    if algo == "xxh3":
+        if xxhash is None:
+            raise RuntimeError("xxhash not installed; pip install xxhash")
+        return xxhash.xxh3_128()
+    raise ValueError(f"unsupported hash algorithm: {algo}")
+
+def _fadvise(f, advice: str):
+    if hasattr(os, "posix_fadvise") and hasattr(os, advice):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, getattr(os, advice))
+        except OSError:
+            pass
+
+def _hash_mmap(f, h):
+    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
     try:
-        return fi.path, hash_file(fi.path), None
+        if hasattr(mm, "madvise"):
+            for advice in ("MADV_SEQUENTIAL", "MADV_WILLNEED"):
+                if hasattr(mmap, advice):
+                    mm.madvise(getattr(mmap, advice))
+        h.update(mm)
+    finally:
+        mm.close()
+    return h
+
+_tls = threading.local()
+
+def _read_buffer() -> memoryview:
+    buf = getattr(_tls, "buf", None)
+    if buf is None:
+        buf = _tls.buf = memoryview(bytearray(CHUNK_SIZE))
+    return buf
+
+def _hash_stream(f, h):
+    buf = _read_buffer()
+    while n := f.readinto(buf):
+        h.update(buf[:n])
+    return h
+
+def _open_read(path: str):
+    flags = os.O_RDONLY | getattr(os, "O_BINARY", 0) | getattr(os, "O_CLOEXEC", 0)
+    noatime = getattr(os, "O_NOATIME", 0)
+    try:
+        # skip the atime update (a journaled metadata write) for every file we read
+        fd = os.open(path, flags | noatime)
+    except PermissionError:
+        # O_NOATIME needs file ownership or CAP_FOWNER
+        if not noatime:
+            raise
+        fd = os.open(path, flags)
+    # unbuffered: reads go straight into our own chunk buffer
+    return os.fdopen(fd, "rb", buffering=0)
+
+def hash_file(path: str, algo: str = "sha256") -> str:
+    with _open_read(path) as f:
+        # widen readahead while hashing, then drop the pages so a big scan doesn't evict the page cache
+        _fadvise(f, "POSIX_FADV_SEQUENTIAL")
+        try:
+            if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+                return _hash_mmap(f, _new_hasher(algo)).hexdigest()
+            return _hash_stream(f, _new_hasher(algo)).hexdigest()
+        finally:
+            _fadvise(f, "POSIX_FADV_DONTNEED")
+
+def _pread(f, n: int, offset: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(f.fileno(), n, offset)
+    f.seek(offset)
+    return f.read(n)
+
+def quick_fingerprint(path: str, size: int) -> str:
+    h = xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=16)
+    with _open_read(path) as f:
+        h.update(_pread(f, min(FP_SIZE, size), 0))
+        if size > 2 * FP_SIZE:
+            h.update(_pread(f, FP_SIZE, size - FP_SIZE))
+    return f"{FP_ALGO}:{h.hexdigest()}"
+
+def _fingerprint_fileinfo(fi: FileInfo) -> Tuple[Optional[str], Optional[str]]:
+    try:
+        return quick_fingerprint(fi.path, fi.size), None
     except Exception as e:
-        return fi.path, None, str(e)
+        return None, str(e)
+
+def _hash_path(path: str, algo: str = "sha256") -> Tuple[str, Optional[str], Optional[str]]:
+    try:
+        return path, hash_file(path, algo), None
+    except Exception as e:
+        return path, None, str(e)
+
+def _inode_key(fi: FileInfo) -> Optional[str]:
+    # scandir on Windows reports st_ino == 0; fall back to the path there
+    return f"{fi.dev}:{fi.ino}" if fi.ino else None
+
+def _entry_matches(entry: dict, fi: FileInfo) -> bool:
+    mtime = entry.get("mtime")
+    return entry.get("size") == fi.size and mtime is not None and abs(mtime - fi.mtime) < 1e-6
+
+def _db_path(path: str):
+    # sqlite3 can't bind the surrogate escapes os.scandir uses for non-UTF-8 names; store those as BLOBs
+    try:
+        path.encode("utf-8")
+        return path
+    except UnicodeEncodeError:
+        return path.encode("utf-8", "surrogateescape")
+
+def _row_path(value) -> str:
+    return value.decode("utf-8", "surrogateescape") if isinstance(value, bytes) else value
+
+def _inode_key_like(key: str) -> bool:
+    dev, _, ino = key.partition(":")
+    return dev.isdigit() and ino.isdigit()
 
-def load_cache(cache_path: Optional[Path]) -> Dict[str, dict]:
+class SqliteCache:
+    # rows are fetched lazily by inode/path; only rows that changed are written back
+    COLUMNS = ("path", "dev", "ino", "size", "mtime", "algo", "digest", "fingerprint")
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, dev INTEGER, ino INTEGER, size INTEGER, mtime REAL,"
+            " algo TEXT, digest TEXT, fingerprint TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS files_ino ON files (ino)")
+        self.conn.commit()
+        self._seen: Dict[str, dict] = {}
+        self._stale_inodes: set = set()
+
+    def _select(self, column: str, values: List) -> Iterator[dict]:
+        for i in range(0, len(values), SQLITE_BATCH):
+            batch = values[i:i + SQLITE_BATCH]
+            rows = self.conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM files WHERE {column} IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for row in rows:
+                e = dict(zip(self.COLUMNS, row))
+                e["path"] = _row_path(e["path"])
+                yield e
+
+    def get_many(self, files: List[FileInfo]) -> Dict[str, dict]:
+        # same shape as the JSON cache: rows keyed by path, plus the best row per "dev:ino"
+        found = {e["path"]: e for e in self._select("path", [_db_path(fi.path) for fi in files])}
+        self._seen.update(found)
+        by_inode: Dict[Tuple[int, int], List[dict]] = {}
+        for e in self._select("ino", list({fi.ino for fi in files if fi.ino})):
+            by_inode.setdefault((e["dev"], e["ino"]), []).append(e)
+        scanned: Dict[Tuple[int, int], set] = {}
+        for fi in files:
+            rows = by_inode.get((fi.dev, fi.ino)) if fi.ino else None
+            if rows:
+                found[_inode_key(fi)] = next((e for e in rows if _entry_matches(e, fi)), rows[0])
+                scanned.setdefault((fi.dev, fi.ino), set()).add(fi.path)
+        for inode, paths in scanned.items():
+            if any(e["path"] not in paths for e in by_inode[inode]):
+                self._stale_inodes.add(inode)
+        return found
+
+    def update(self, files_map: Dict[str, dict]):
+        changed = [e for e in files_map.values() if self._seen.get(e["path"]) != e]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                [(_db_path(e["path"]),) + tuple(e[c] for c in self.COLUMNS[1:]) for e in changed],
+            )
+            # rows left behind by a move/rename (or a deleted file whose inode got reused)
+            self.conn.executemany(
+                "DELETE FROM files WHERE dev = ? AND ino = ? AND path != ?",
+                [
+                    (e["dev"], e["ino"], _db_path(e["path"])) for e in files_map.values()
+                    if e["ino"] and (self._seen.get(e["path"]) != e or (e["dev"], e["ino"]) in self._stale_inodes)
+                ],
+            )
+
+    def import_entries(self, entries: Dict[str, dict]):
+        # entries from a JSON/msgpack cache: v3 carries path/dev/ino, v1/v2 are keyed by path
+        rows = [
+            (_db_path(e.get("path") or k), e.get("dev"), e.get("ino"), e.get("size"), e.get("mtime"),
+             e.get("algo"), e.get("digest"), e.get("fingerprint"))
+            for k, e in entries.items() if e.get("path") or not _inode_key_like(k)
+        ]
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                rows,
+            )
+
+    def recorded_algo(self) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT algo FROM files WHERE digest IS NOT NULL GROUP BY algo ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.conn.close()
+
+def load_cache(cache_path: Optional[Path]) -> Union[Dict[str, dict], SqliteCache]:
+    if cache_path and cache_path.suffix.lower() in SQLITE_SUFFIXES:
+        legacy = cache_path.with_name(LEGACY_CACHE_FILE)
+        migrate = cache_path.name == DEFAULT_CACHE_FILE and not cache_path.exists() and legacy.exists()
+        cache = SqliteCache(cache_path)
+        if migrate:
+            # one-time import of the pre-SQLite default cache so upgrading doesn't re-hash everything
+            cache.import_entries(load_cache(legacy))
+        return cache
     if not cache_path or not cache_path.exists():
         return {}
     try:
-        with cache_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-        if data.get("version") == CACHE_VERSION:
+        raw = cache_path.read_bytes()
+        # JSON caches (older runs, or msgpack unavailable) always start with '{'
+        if msgpack is not None and not raw.lstrip().startswith(b"{"):
+            data = msgpack.unpackb(raw, raw=False, unicode_errors="surrogateescape")
+        else:
+            data = json.loads(raw)
+        # v2 entries are keyed by path, which preload_hashes_from_cache still falls back to
+        if data.get("version") in (CACHE_VERSION, 2):
             return data.get("files", {})
+        if data.get("version") == 1:
+            return {
+                k: {"size": e.get("size"), "mtime": e.get("mtime"), "algo": "sha256",
+                    "digest": e.get("sha256"), "fingerprint": e.get("fingerprint")}
+                for k, e in data.get("files", {}).items()
+            }
     except Exception:
         pass
     return {}
 
-def save_cache(cache_path: Optional[Path], files_map: Dict[str, dict]):
+def _algo_available(algo: str) -> bool:
+    return algo == "sha256" or (algo == "blake3" and blake3 is not None) or (algo == "xxh3" and xxhash is not None)
+
+def cache_algo(cache: Union[Dict[str, dict], SqliteCache]) -> Optional[str]:
+    if isinstance(cache, SqliteCache):
+        algo = cache.recorded_algo()
+    else:
+        counts = Counter(e.get("algo") for e in cache.values() if e.get("digest"))
+        algo = counts.most_common(1)[0][0] if counts else None
+    return algo if algo in HASH_ALGOS and _algo_available(algo) else None
+
+def save_cache(cache_path: Optional[Path], files_map: Dict[str, dict], cache: Union[Dict[str, dict], SqliteCache, None] = None):
+    if isinstance(cache, SqliteCache):
+        cache.update(files_map)
+        cache.close()
+        return
     if not cache_path:
         return
     cache_path.parent.mkdir(parents=True, exist_ok=True)
     tmp = cache_path.with_suffix(cache_path.suffix + ".tmp")
     data = {"version": CACHE_VERSION, "files": files_map}
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    with tmp.open("wb") as f:
+        if msgpack is not None:
+            msgpack.pack(data, f, unicode_errors="surrogateescape")
+        else:
+            f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
     tmp.replace(cache_path)
 
-def preload_hashes_from_cache(files: List[FileInfo], cache: Dict[str, dict], refresh: bool) -> List[FileInfo]:
+def group_by_size(files: List[FileInfo]) -> Dict[int, List[FileInfo]]:
+    # only sizes shared by 2+ files; a file whose size is missing here can't have a duplicate
+    by_size: Dict[int, List[FileInfo]] = {}
+    if np is not None and files:
+        sizes = np.fromiter((fi.size for fi in files), dtype=np.int64, count=len(files))
+        _, inverse, counts = np.unique(sizes, return_inverse=True, return_counts=True)
+        for i in np.flatnonzero(counts[inverse] > 1).tolist():
+            by_size.setdefault(files[i].size, []).append(files[i])
+        return by_size
+    counts = Counter(fi.size for fi in files)
+    for fi in files:
+        if counts[fi.size] > 1:
+            by_size.setdefault(fi.size, []).append(fi)
+    return by_size
+
+def group_by_inode(files: List[FileInfo]) -> Dict[Tuple[int, int], List[FileInfo]]:
+    # hardlinks share (st_dev, st_ino); the first path in each group stands in for the rest
+    by_inode: Dict[Tuple[int, int], List[FileInfo]] = {}
+    for fi in files:
+        if fi.ino:
+            by_inode.setdefault((fi.dev, fi.ino), []).append(fi)
+    return {k: sorted(v, key=lambda fi: fi.path) for k, v in by_inode.items() if len(v) > 1}
+
+def hardlink_siblings(inode_groups: Dict[Tuple[int, int], List[FileInfo]]) -> set:
+    return {id(fi) for links in inode_groups.values() for fi in links[1:]}
+
+def share_with_hardlinks(inode_groups: Dict[Tuple[int, int], List[FileInfo]]):
+    for links in inode_groups.values():
+        rep = links[0]
+        for fi in links[1:]:
+            if rep.digest:
+                fi.digest = rep.digest
+            if rep.fingerprint:
+                fi.fingerprint = rep.fingerprint
+
+@lru_cache(maxsize=None)
+def _is_rotational(dev: int) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    # whole disks have queue/ directly; partitions inherit it from their parent device
+    for candidate in (os.path.join(base, "queue", "rotational"),
+                      os.path.join(os.path.realpath(base), "..", "queue", "rotational")):
+        try:
+            with open(candidate) as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return False
+
+def sort_for_disk(files: List[FileInfo]) -> List[FileInfo]:
+    # inode order approximates on-disk layout (ext4/xfs); only worth it where seeks are expensive
+    if any(_is_rotational(dev) for dev in {fi.dev for fi in files}):
+        return sorted(files, key=lambda fi: (fi.dev, fi.ino))
+    return files
+
+def preload_hashes_from_cache(files: List[FileInfo], cache: Union[Dict[str, dict], SqliteCache], refresh: bool,
+                              size_groups: Optional[Dict[int, List[FileInfo]]] = None,
+                              algo: str = "sha256") -> List[FileInfo]:
+    if isinstance(cache, SqliteCache):
+        cache = {} if refresh else cache.get_many(files)
     to_hash = []
     for fi in files:
-        key = str(fi.path)
-        if not refresh and key in cache:
-            entry = cache[key]
-            if entry.get("size") == fi.size and abs(entry.get("mtime", -1) - fi.mtime) < 1e-6:
-                fi.sha256 = entry.get("sha256")
-        if fi.sha256 is None:
+        entry = None
+        if not refresh:
+            key = _inode_key(fi)
+            # a stale inode entry (e.g. a reused inode) must not hide a valid entry for the path
+            candidates = (cache.get(key) if key else None, cache.get(fi.path))
+            entry = next((e for e in candidates if e and _entry_matches(e, fi)), None)
+        if entry:
+            if entry.get("algo") == algo:
+                fi.digest = entry.get("digest")
+            fp = entry.get("fingerprint")
+            if fp and fp.startswith(FP_ALGO + ":"):
+                fi.fingerprint = fp
+        if fi.digest is None and (size_groups is None or fi.size in size_groups):
             to_hash.append(fi)
     return to_hash
 
-def update_cache_from_files(files: List[FileInfo]) -> Dict[str, dict]:
-    return {str(fi.path): {"size": fi.size, "mtime": fi.mtime, "sha256": fi.sha256} for fi in files if fi.sha256}
+def update_cache_from_files(files: List[FileInfo], algo: str = "sha256") -> Dict[str, dict]:
+    return {
+        _inode_key(fi) or fi.path: {
+            "path": fi.path, "dev": fi.dev, "ino": fi.ino, "size": fi.size, "mtime": fi.mtime,
+            "algo": algo if fi.digest else None, "digest": fi.digest, "fingerprint": fi.fingerprint,
+        }
+        for fi in files if fi.digest or fi.fingerprint
+    }
+
+def compute_fingerprints(files: List[FileInfo], workers: int = 0):
+    if not files:
+        return
+    if workers <= 0:
+        workers = max(2, os.cpu_count() or 2)
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        results = ex.map(_fingerprint_fileinfo, files)
+        if tqdm:
+            results = tqdm(results, total=len(files), unit="file", desc="Fingerprinting")
+        for fi, (fp, err) in zip(files, results):
+            if fp:
+                fi.fingerprint = fp
+            else:
+                print(f"Failed to fingerprint {fi.path}: {err}", file=sys.stderr)
+
+def narrow_by_fingerprint(to_hash: List[FileInfo], size_groups: Dict[int, List[FileInfo]], workers: int = 0,
+                          inode_groups: Optional[Dict[Tuple[int, int], List[FileInfo]]] = None) -> List[FileInfo]:
+    sizes = {fi.size for fi in to_hash if fi.size > FP_SIZE}
+    bucket_files = [fi for size in sizes for fi in size_groups[size]]
+    linked = hardlink_siblings(inode_groups) if inode_groups else set()
+    compute_fingerprints(sort_for_disk([fi for fi in bucket_files if fi.fingerprint is None and id(fi) not in linked]), workers=workers)
+    if inode_groups:
+        share_with_hardlinks(inode_groups)
+    fp_counts: Dict[Tuple[int, str], int] = {}
+    unfingerprinted = set()
+    for fi in bucket_files:
+        if fi.fingerprint is None:
+            unfingerprinted.add(fi.size)
+        else:
+            key = (fi.size, fi.fingerprint)
+            fp_counts[key] = fp_counts.get(key, 0) + 1
+    return [
+        fi for fi in to_hash
+        if fi.size not in sizes or fi.size in unfingerprinted or fp_counts[(fi.size, fi.fingerprint)] > 1
+    ]
 
-def compute_hashes_threaded(files_to_hash: List[FileInfo], workers: int = 0):
+def _run_hash_pool(pool_cls, files_to_hash: List[FileInfo], workers: int, algo: str):
     if not files_to_hash:
         return
     if workers <= 0:
         workers = max(2, os.cpu_count() or 2)
-    if tqdm:
-        with ThreadPoolExecutor(max_workers=workers) as ex, tqdm(total=len(files_to_hash), unit="file", desc="Hashing") as bar:
-            futures = {ex.submit(_hash_fileinfo, fi): fi for fi in files_to_hash}
-            for fut in as_completed(futures):
-                fi = futures[fut]
-                path, h, err = fut.result()
-                if h:
-                    fi.sha256 = h
-                else:
-                    print(f"Failed to hash {path}: {err}", file=sys.stderr)
-                bar.update(1)
+    by_path = {fi.path: fi for fi in files_to_hash}
+    # big chunks amortize task dispatch/IPC; small inputs still spread over every worker
+    chunksize = max(1, min(HASH_CHUNKSIZE, len(by_path) // (workers * 4)))
+    with pool_cls(workers) as pool:
+        results = pool.imap_unordered(partial(_hash_path, algo=algo), by_path, chunksize=chunksize)
+        if tqdm:
+            results = tqdm(results, total=len(by_path), unit="file", desc="Hashing")
+        for path, h, err in results:
+            if h:
+                by_path[path].digest = h
+            else:
+                print(f"Failed to hash {path}: {err}", file=sys.stderr)
+
+def compute_hashes_threaded(files_to_hash: List[FileInfo], workers: int = 0, algo: str = "sha256"):
+    _run_hash_pool(ThreadPool, files_to_hash, workers, algo)
+
+def compute_hashes_process(files_to_hash: List[FileInfo], workers: int = 0, algo: str = "sha256"):
+    _run_hash_pool(Pool, files_to_hash, workers, algo)
+
+def compute_hashes(files_to_hash: List[FileInfo], workers: int = 0, algo: str = "sha256"):
+    # process start-up is slow on Windows (spawn); threads already scale since hashlib releases the GIL
+    if os.name != "nt" and sum(fi.size for fi in files_to_hash) >= PROCESS_POOL_MIN_BYTES:
+        compute_hashes_process(files_to_hash, workers=workers, algo=algo)
     else:
-        with ThreadPoolExecutor(max_workers=workers) as ex:
-            futures = {ex.submit(_hash_fileinfo, fi): fi for fi in files_to_hash}
-            for fut in as_completed(futures):
-                fi = futures[fut]
-                path, h, err = fut.result()
-                if h:
-                    fi.sha256 = h
-                else:
-                    print(f"Failed to hash {path}: {err}", file=sys.stderr)
+        compute_hashes_threaded(files_to_hash, workers=workers, algo=algo)
 
-def group_by_hash(files: List[FileInfo]) -> Dict[str, List[FileInfo]]:
+def group_by_hash(files: List[FileInfo], size_groups: Optional[Dict[int, List[FileInfo]]] = None) -> Dict[str, List[FileInfo]]:
     by_hash: Dict[str, List[FileInfo]] = {}
+    fp_counts: Dict[Tuple[int, str], int] = {}
     for fi in files:
-        if fi.sha256:
-            by_hash.setdefault(fi.sha256, []).append(fi)
+        if fi.fingerprint:
+            key = (fi.size, fi.fingerprint)
+            fp_counts[key] = fp_counts.get(key, 0) + 1
+    for fi in files:
+        if fi.digest:
+            by_hash.setdefault(fi.digest, []).append(fi)
+        elif size_groups is not None and fi.size not in size_groups:
+            # unique size: cannot have a duplicate, so it was never hashed
+            by_hash[f"size:{fi.size}"] = [fi]
+        elif fi.fingerprint and fp_counts[(fi.size, fi.fingerprint)] == 1:
+            # unique fingerprint within its size bucket: skipped the full hash
+            by_hash[f"fp:{fi.size}:{fi.fingerprint}"] = [fi]
     return by_hash
 
 def choose_kept(files: List[FileInfo]) -> Tuple[FileInfo, List[FileInfo]]:
@@ -162,17 +606,52 @@ def choose_kept(files: List[FileInfo]) -> Tuple[FileInfo, List[FileInfo]]:
     dups = [f for f in files if f.path != kept.path]
     return kept, dups
 
-def safe_move(src: Path, dst: Path, dry_run: bool):
+def plan_moves(moves: List[Tuple[Path, Path]]) -> List[Tuple[Path, Path]]:
+    # resolve name collisions in memory: one listdir per destination directory instead of a stat per candidate.
+    # names compare case-insensitively so IMG.JPG and img.jpg can't clobber each other on APFS/NTFS
+    taken: Dict[Path, set] = {}
+    next_dup: Counter = Counter()
+    plan = []
+    for src, dst in moves:
+        names = taken.get(dst.parent)
+        if names is None:
+            try:
+                names = {n.casefold() for n in os.listdir(dst.parent)}
+            except OSError:
+                names = set()
+            taken[dst.parent] = names
+        final = dst.name
+        while final.casefold() in names:
+            next_dup[dst.parent, dst.name] += 1
+            final = f"{dst.stem}__dup{next_dup[dst.parent, dst.name]}{dst.suffix}"
+        names.add(final.casefold())
+        plan.append((src, dst.parent / final))
+    return plan
+
+def apply_moves(plan: List[Tuple[Path, Path]], dry_run: bool):
     if dry_run:
-        print(f"[DRY] MOVE {src} -> {dst}")
+        for src, dst in plan:
+            print(f"[DRY] MOVE {src} -> {dst}")
         return
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    final = dst
-    i = 1
-    while final.exists():
-        final = dst.with_name(f"{dst.stem}__dup{i}{dst.suffix}")
-        i += 1
-    shutil.move(str(src), str(final))
+    for d in {dst.parent for _, dst in plan}:
+        os.makedirs(d, exist_ok=True)
+    for src, dst in plan:
+        # the plan is a snapshot; os.rename silently replaces on POSIX, so never move onto something that exists now
+        final = dst
+        i = 1
+        while os.path.lexists(final):
+            final = dst.with_name(f"{dst.stem}__dup{i}{dst.suffix}")
+            i += 1
+        dst = final
+        try:
+            try:
+                os.rename(src, dst)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.move(str(src), str(dst))
+        except Exception as e:
+            print(f"Failed to move {src}: {e}", file=sys.stderr)
 
 def safe_delete(p: Path, dry_run: bool):
     if dry_run:
@@ -183,6 +662,17 @@ def safe_delete(p: Path, dry_run: bool):
     except Exception as e:
         print(f"Failed to delete {p}: {e}", file=sys.stderr)
 
+def delete_many(paths: List[Path], dry_run: bool, workers: int = 0):
+    if dry_run or len(paths) < 2:
+        for p in paths:
+            safe_delete(p, dry_run)
+        return
+    if workers <= 0:
+        workers = min(8, len(paths))
+    # unlink is latency-bound (journal, network filesystems), so overlap a few at a time
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        list(ex.map(lambda p: safe_delete(p, dry_run=False), paths))
+
 def safe_trash(p: Path, dry_run: bool):
     if dry_run:
         print(f"[DRY] TRASH {p}")
@@ -191,42 +681,49 @@ def safe_trash(p: Path, dry_run: bool):
         raise RuntimeError("send2trash not installed; pip install send2trash")
     send2trash(str(p))
 
-def organize_kept(kept: FileInfo, mode: str, base_dir: Path, dry_run: bool):
+def organize_target(kept: FileInfo, mode: str, base_dir: Path) -> Optional[Path]:
+    src = Path(kept.path)
     if mode == "yyyymm":
         t = localtime(kept.mtime)
         sub = Path(strftime("%Y", t)) / strftime("%m", t)
-        dst = base_dir / sub / kept.path.name
+        dst = base_dir / sub / src.name
     elif mode == "ext":
-        ext = kept.path.suffix.lower().lstrip(".") or "noext"
-        dst = base_dir / "_by_ext" / ext / kept.path.name
+        ext = src.suffix.lower().lstrip(".") or "noext"
+        dst = base_dir / "_by_ext" / ext / src.name
     else:
         return None
-    safe_move(kept.path, dst, dry_run)
     return dst
 
-def make_report(groups: Dict[str, List[FileInfo]]):
-    out = []
+def iter_report_groups(groups: Dict[str, List[FileInfo]]) -> Iterator[dict]:
     for h, files in groups.items():
         kept, dups = choose_kept(files)
-        out.append({
+        yield {
             "hash": h,
-            "kept": str(kept.path),
+            "kept": kept.path,
             "kept_mtime": kept.mtime,
-            "duplicates": [str(d.path) for d in dups],
-        })
-    return {"groups": out}
+            "duplicates": [d.path for d in dups],
+        }
 
-def write_reports(report: Dict, csv_path: Optional[Path], json_path: Optional[Path]):
+def write_reports(groups: Dict[str, List[FileInfo]], csv_path: Optional[Path], json_path: Optional[Path],
+                  inode_groups: Optional[Dict[Tuple[int, int], List[FileInfo]]] = None):
     if json_path:
         json_path.parent.mkdir(parents=True, exist_ok=True)
-        with json_path.open("w", encoding="utf-8") as f:
-            json.dump(report, f, indent=2)
+        with json_path.open("w", encoding="utf-8", buffering=REPORT_BUFFER) as f:
+            f.write('{"groups": [')
+            for i, grp in enumerate(iter_report_groups(groups)):
+                f.write(",\n  " if i else "\n  ")
+                f.write(json.dumps(grp))
+            f.write("\n]")
+            if inode_groups:
+                f.write(', "hardlinks": ')
+                json.dump([[fi.path for fi in links] for links in inode_groups.values()], f)
+            f.write("}\n")
     if csv_path:
         csv_path.parent.mkdir(parents=True, exist_ok=True)
-        with csv_path.open("w", newline="", encoding="utf-8") as f:
+        with csv_path.open("w", newline="", encoding="utf-8", buffering=REPORT_BUFFER) as f:
             w = csv.writer(f)
             w.writerow(["hash", "kept", "kept_mtime", "duplicate"])
-            for grp in report["groups"]:
+            for grp in iter_report_groups(groups):
                 if not grp["duplicates"]:
                     w.writerow([grp["hash"], grp["kept"], grp["kept_mtime"], ""])
                 else:
@@ -246,11 +743,18 @@ def parse_args():
     p.add_argument("--report-csv", default=None)
     p.add_argument("--report-json", default=None)
     p.add_argument("--workers", type=int, default=0)
-    p.add_argument("--cache-file", default=".dedupe_cache.json")
+    p.add_argument("--hash", choices=HASH_ALGOS, default=None,
+                   help="default: the algorithm already used by the cache, else blake3 if installed, else sha256")
+    p.add_argument("--cache-file", default=DEFAULT_CACHE_FILE)
     p.add_argument("--no-cache", action="store_true")
     p.add_argument("--refresh-cache", action="store_true")
     p.add_argument("--no-color", action="store_true")
-    return p.parse_args()
+    args = p.parse_args()
+    if args.hash == "blake3" and blake3 is None:
+        p.error("--hash blake3 requires the blake3 package; pip install blake3")
+    if args.hash == "xxh3" and xxhash is None:
+        p.error("--hash xxh3 requires the xxhash package; pip install xxhash")
+    return args
 
 def main():
     args = parse_args()
@@ -258,30 +762,43 @@ def main():
     roots = [Path(r).expanduser() for r in args.paths]
     files = iter_files(roots, min_size=args.min_size)
     cache_path = None if args.no_cache else Path(args.cache_file).expanduser()
+    size_groups = group_by_size(files)
+    inode_groups = group_by_inode(files)
+    linked = hardlink_siblings(inode_groups)
     cache = load_cache(cache_path)
-    to_hash = preload_hashes_from_cache(files, cache, refresh=args.refresh_cache)
-    compute_hashes_threaded(to_hash, workers=args.workers)
+    if args.hash is None:
+        args.hash = cache_algo(cache) or DEFAULT_HASH
+    to_hash = preload_hashes_from_cache(files, cache, refresh=args.refresh_cache, size_groups=size_groups, algo=args.hash)
+    to_hash = sort_for_disk([fi for fi in to_hash if id(fi) not in linked])
+    to_hash = narrow_by_fingerprint(to_hash, size_groups, workers=args.workers, inode_groups=inode_groups)
+    compute_hashes(to_hash, workers=args.workers, algo=args.hash)
+    share_with_hardlinks(inode_groups)
     if not args.no_cache:
-        save_cache(cache_path, update_cache_from_files(files))
-    groups = group_by_hash(files)
+        save_cache(cache_path, update_cache_from_files(files, algo=args.hash), cache)
+    groups = group_by_hash(files, size_groups)
     dup_groups = {h: lst for h, lst in groups.items() if len(lst) > 1}
     duplicates_dir = Path(args.duplicates_dir).expanduser()
     organize_root = Path(args.organize_root).expanduser()
+    moves: List[Tuple[Path, Path]] = []
+    deletes: List[Path] = []
     for h, lst in dup_groups.items():
         kept, dups = choose_kept(lst)
         print(f"Hash: {h[:12]} KEEP: {kept.path}")
         for d in dups:
+            src = Path(d.path)
             if args.duplicate_action == "move":
-                rel_parent = d.path.parent.name
-                dst = duplicates_dir / rel_parent / d.path.name
-                safe_move(d.path, dst, dry_run=not args.apply)
+                moves.append((src, duplicates_dir / src.parent.name / src.name))
             elif args.duplicate_action == "delete":
-                safe_delete(d.path, dry_run=not args.apply)
+                deletes.append(src)
             elif args.duplicate_action == "trash":
-                safe_trash(d.path, dry_run=not args.apply)
+                safe_trash(src, dry_run=not args.apply)
         if args.organize == "kept":
-            organize_kept(kept, mode=args.org_mode, base_dir=organize_root, dry_run=not args.apply)
-    write_reports(make_report(groups), Path(args.report_csv) if args.report_csv else None, Path(args.report_json) if args.report_json else None)
+            dst = organize_target(kept, mode=args.org_mode, base_dir=organize_root)
+            if dst is not None:
+                moves.append((Path(kept.path), dst))
+    apply_moves(plan_moves(moves), dry_run=not args.apply)
+    delete_many(deletes, dry_run=not args.apply)
+    write_reports(groups, Path(args.report_csv) if args.report_csv else None, Path(args.report_json) if args.report_json else None, inode_groups)
 
 if __name__ == "__main__":
     main()